@@ -0,0 +1,202 @@
+import os
+import tempfile
+import threading
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from pydantic import BaseModel, Field
+
+from data_processing import load_file, split_docs
+from db_utils import check_env, cleanup, prepare_documents, replace_documents, delete_file, embed_queries, search_by_vector, search_index
+from langgraph_flow import build_rag_graph, GraphState
+
+# headless entry point: same ingestion/retrieval/graph as app.py, no streamlit session needed.
+# run with `uvicorn api:app --workers N` (or `python api.py`), every worker keeps its own
+# embedding model, mongo client and compiled graph for its whole lifetime.
+
+batch_concurrency = int(os.getenv("API_BATCH_CONCURRENCY", "4"))
+max_k = int(os.getenv("API_MAX_K", "50"))
+
+_rag_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_rag_graph():
+    global _rag_graph
+    if _rag_graph is None:
+        with _graph_lock:
+            if _rag_graph is None:
+                _rag_graph = build_rag_graph()
+    return _rag_graph
+
+
+class QueryRequest(BaseModel):
+    question: str
+    file_names: List[str]
+    k: int = Field(5, ge=1, le=max_k)
+
+
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
+    file_names: List[str]
+    k: int = Field(5, ge=1, le=max_k)
+    retrieve_only: bool = False
+
+
+class SourceChunk(BaseModel):
+    file_name: Optional[str] = None
+    page: Optional[int] = None
+    score: Optional[float] = None
+    content: str
+
+
+class QueryResponse(BaseModel):
+    question: str
+    answer: Optional[str] = None
+    relevance_score: Optional[int] = None
+    sources: List[SourceChunk] = []
+    error: Optional[str] = None
+
+
+def _sources(documents) -> List[SourceChunk]:
+    return [
+        SourceChunk(
+            file_name=doc.metadata.get("file_name"),
+            page=doc.metadata.get("page"),
+            score=doc.metadata.get("score"),
+            content=doc.page_content,
+        )
+        for doc in documents
+    ]
+
+
+def _run_graph(question: str, file_names: List[str], k: int, query_embedding: List[float] = None) -> QueryResponse:
+    initial_state = GraphState(
+        query=question,
+        selected_file_names=list(file_names),
+        search_index_name=search_index,
+        documents=[],
+        answer="",
+        retry_count=0,
+        search_kwargs={"k": k},
+        query_embedding=query_embedding,
+    )
+    final_state = get_rag_graph().invoke(initial_state)
+    return QueryResponse(
+        question=question,
+        answer=final_state.get("answer"),
+        relevance_score=final_state.get("relevance_score"),
+        sources=_sources(final_state.get("documents", [])),
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    check_env()
+    get_rag_graph()
+    yield
+
+
+app = FastAPI(title="DynaBOT API", lifespan=lifespan)
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+
+@app.get("/files")
+def list_files():
+    return {"files": sorted(cleanup())}
+
+
+@app.post("/files")
+def ingest_file(file: UploadFile = File(...)):
+    file_name = file.filename
+    file_ext = os.path.splitext(file_name)[1].lower()
+    if file_ext not in (".pdf", ".pptx"):
+        raise HTTPException(status_code=400, detail=f"Unsupported file extension: {file_ext}")
+
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp_file:
+            tmp_file.write(file.file.read())
+            tmp_path = tmp_file.name
+
+        docs = load_file(tmp_path)
+        chunks = split_docs(docs)
+        records = prepare_documents(chunks, file_name)
+        # re-uploading a file replaces its chunks, old ones stay until the new ones are in
+        replace_documents(records, file_name)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to ingest {file_name}: {e}")
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return {"file_name": file_name, "chunks": len(chunks)}
+
+
+@app.delete("/files/{file_name}")
+def remove_file(file_name: str):
+    delete_file(file_name)
+    return {"file_name": file_name, "deleted": True}
+
+
+@app.post("/query", response_model=QueryResponse)
+def query(request: QueryRequest):
+    if not request.file_names:
+        raise HTTPException(status_code=400, detail="file_names must not be empty")
+    return _run_graph(request.question, request.file_names, request.k)
+
+
+@app.post("/batch_query", response_model=List[QueryResponse])
+def batch_query(request: BatchQueryRequest):
+    if not request.file_names:
+        raise HTTPException(status_code=400, detail="file_names must not be empty")
+
+    # one encoder forward pass for the whole batch
+    vectors = embed_queries(request.questions)
+
+    if request.retrieve_only:
+        responses = []
+        for question, vector in zip(request.questions, vectors):
+            try:
+                sources = _sources(search_by_vector(vector, request.file_names, k=request.k))
+                responses.append(QueryResponse(question=question, sources=sources))
+            except Exception as e:
+                print(f"Error during batch retrieval '{question}': {e}")
+                responses.append(QueryResponse(question=question, error=str(e)))
+        return responses
+
+    with ThreadPoolExecutor(max_workers=batch_concurrency) as pool:
+        futures = [
+            pool.submit(_run_graph, question, request.file_names, request.k, vector)
+            for question, vector in zip(request.questions, vectors)
+        ]
+        return [_batch_result(question, future) for question, future in zip(request.questions, futures)]
+
+
+def _batch_result(question: str, future) -> QueryResponse:
+    # one failing question must not throw away the rest of the batch
+    try:
+        return future.result()
+    except Exception as e:
+        print(f"Error during batch query '{question}': {e}")
+        return QueryResponse(question=question, error=str(e))
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        "api:app",
+        host=os.getenv("API_HOST", "0.0.0.0"),
+        port=int(os.getenv("API_PORT", "8000")),
+        workers=int(os.getenv("API_WORKERS", "1")),
+    )
@@ -4,7 +4,7 @@ import streamlit as st
 if "selected_file_name" not in st.session_state: 
     st.session_state.selected_file_name=None
     
-import tempfile
+import uuid
 from streamlit_pdf_viewer import pdf_viewer
 from streamlit_extras.stylable_container import stylable_container
 import os
@@ -12,6 +12,8 @@ load_dotenv()
 from data_processing import load_file, split_docs, convert_pptx_to_pdf
 from db_utils import check_env, cleanup, add_documents, delete_file,search_index
 from langgraph_flow import build_rag_graph, GraphState
+from pdf_pages import viewer_mode, viewer_window, page_count, window_start, render_page_window, cited_pages
+from session_store import ChatStore, FileCache, prune_sessions
 
 
 @st.cache_resource(show_spinner=False)
@@ -20,6 +22,102 @@ def get_rag_graph():
 
 rag_graph_app = get_rag_graph()
 
+
+@st.cache_resource(show_spinner=False)
+def get_file_cache():
+    return FileCache()
+
+file_cache = get_file_cache()
+
+
+def materialize_file(uploaded_file):
+    # uploads (and pdfs converted from pptx) live in the shared content-addressed cache,
+    # the viewer pdf is always <digest>.pdf so a converted pptx is reused across sessions
+    file_ext = os.path.splitext(uploaded_file.name)[1].lower()
+    digest, tmp_path = file_cache.put_bytes(uploaded_file.getvalue(), file_ext)
+    pdf_viewer_path = None
+    if file_ext == ".pptx":
+        pdf_viewer_path = file_cache.get(digest, ".pdf") or convert_pptx_to_pdf(tmp_path, file_cache.cache_dir)
+        if pdf_viewer_path:
+            file_cache.evict(keep={tmp_path, pdf_viewer_path})
+    elif file_ext == ".pdf":
+        pdf_viewer_path = tmp_path
+    return digest, tmp_path, pdf_viewer_path
+
+
+def show_messages(messages):
+    for message in messages:
+        avatar="https://img.icons8.com/?size=100&id=0LnHUOCnYTrK&format=png&color=F25081" if message["role"] == "user" else "https://img.icons8.com/?size=100&id=100414&format=png&color=7950F2"
+        with st.chat_message(message["role"], avatar=avatar):
+            st.write(message["content"])
+
+
+def load_earlier(chat_key, count):
+    st.session_state.earlier_shown[chat_key] = count
+
+
+def show_chat(chat_key):
+    # earlier turns stay on disk until asked for, one window at a time
+    chat_store = st.session_state.chat_store
+    total = chat_store.earlier_count(chat_key)
+    shown = min(st.session_state.earlier_shown.get(chat_key, 0), total)
+    if shown < total:
+        st.button(f"Load earlier messages ({total - shown} more)", key=f"earlier_{chat_key}",
+                  on_click=load_earlier, args=(chat_key, shown + chat_store.window))
+    if shown:
+        st.button("Hide earlier messages", key=f"hide_earlier_{chat_key}",
+                  on_click=load_earlier, args=(chat_key, 0))
+        show_messages(chat_store.earlier(chat_key, shown))
+    show_messages(chat_store.recent(chat_key))
+
+
+def go_to_page(file_name, page):
+    st.session_state.viewer_page[file_name] = page
+
+
+def show_page_window(file_name, file_info):
+    # only the window around the current page is sent to the browser, not the whole pdf
+    total_pages = file_info["page_count"]
+    page = max(1, min(st.session_state.viewer_page.get(file_name, 1), total_pages))
+    start = window_start(page, total_pages)
+    end = min(start + viewer_window - 1, total_pages)
+
+    nav_prev, nav_page, nav_next = st.columns([1, 2, 1])
+    with nav_prev:
+        st.button("◀", key=f"prev_{file_name}", disabled=start == 1,
+                  on_click=go_to_page, args=(file_name, max(1, start - viewer_window)))
+    with nav_page:
+        page_key = f"page_input_{file_name}"
+        # keep the widget in sync with prev/next/cited jumps, set before it is created
+        st.session_state[page_key] = page
+        st.number_input(f"Page (of {total_pages})", min_value=1, max_value=total_pages, key=page_key,
+                        on_change=lambda: go_to_page(file_name, st.session_state[page_key]))
+    with nav_next:
+        st.button("▶", key=f"next_{file_name}", disabled=end >= total_pages,
+                  on_click=go_to_page, args=(file_name, end + 1))
+
+    # stored best chunk first, buttons read better in page order
+    pages = sorted(st.session_state.cited_pages.get(file_name, []))
+    if pages:
+        st.caption("Cited in last answer:")
+        cite_cols = st.columns(min(len(pages), 8))
+        for i, cited_page in enumerate(pages):
+            with cite_cols[i % len(cite_cols)]:
+                st.button(f"p. {cited_page}", key=f"cite_{file_name}_{cited_page}",
+                          on_click=go_to_page, args=(file_name, cited_page))
+
+    slice_path = render_page_window(file_info["pdf_viewer_path"], start, total_pages, file_info["digest"], file_cache)
+    st.caption(f"Pages {start}–{end} of {total_pages}")
+    pdf_viewer(
+            slice_path,
+            width="100%",
+            height=1000,
+            zoom_level="auto",
+            viewer_align="right",
+            show_page_separator=True,
+            scroll_to_page=page - start + 1,
+            )
+
 st.set_page_config(layout="wide", page_title="DynaBOT")
 
 try:
@@ -29,11 +127,21 @@ except EnvironmentError as e:
     st.stop()
     
 if "processed_file_info" not in st.session_state:
-    st.session_state.processed_file_info={} # key:file_name {str} ,value:{ tmp_path=str, ingestion=bool}
+    st.session_state.processed_file_info={} # key:file_name {str} ,value:{ digest=str, tmp_path=str, ingestion=bool}
+
+
+if "chat_store" not in st.session_state:
+    prune_sessions()
+    st.session_state.chat_store = ChatStore(uuid.uuid4().hex) #key: file_name {str} or sorted tuple, value: recent messages, older ones on disk
 
+if "earlier_shown" not in st.session_state:
+    st.session_state.earlier_shown = {} #key: chat key, value: number of spilled messages loaded back {int}
 
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = {} #key: file_name {str}, value: prev chat messages{List}
+if "viewer_page" not in st.session_state:
+    st.session_state.viewer_page = {} #key: file_name {str}, value: current page (1-based) {int}
+
+if "cited_pages" not in st.session_state:
+    st.session_state.cited_pages = {} #key: file_name {str}, value: pages cited in the last answer {List}
 
 if "shown_toasts" not in st.session_state:
     st.session_state.shown_toasts=[]
@@ -83,20 +191,14 @@ if newly_added_files:
 
         try:
             file_ext = os.path.splitext(file_name)[1].lower()
-            with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp_file:
-                tmp_file.write(uploaded_file.read())
-                tmp_path = tmp_file.name
-                
             
             with st.spinner(f"Processing {file_name}..."):
+                digest, tmp_path, pdf_viewer_path = materialize_file(uploaded_file)
                 if file_ext == ".pptx":
-                     pdf_viewer_path = convert_pptx_to_pdf(tmp_path, os.path.dirname(tmp_path))
                      if not pdf_viewer_path:
                         st.error(f"Failed to convert {file_name} to PDF.")
                      else:
                         tmp_path = pdf_viewer_path
-                elif file_ext == ".pdf":
-                    pdf_viewer_path = tmp_path  
 
 
                 docs=load_file(tmp_path)
@@ -106,24 +208,23 @@ if newly_added_files:
                 st.toast("added documents")
 
                 st.session_state.processed_file_info[file_name] = {
+                    "digest": digest,
                     "tmp_path": tmp_path,
                     "pdf_viewer_path": pdf_viewer_path,
+                    "page_count": page_count(pdf_viewer_path) if pdf_viewer_path else 0,
                     "ingested": True
                 }
 
-                if file_name not in st.session_state.chat_history:
-                    st.session_state.chat_history[file_name] = []
+                st.session_state.chat_store.ensure(file_name)
 
         except Exception as e:
 
-                if tmp_path and os.path.exists(tmp_path):
-                    os.remove(tmp_path)
-
+                # cached files may be shared with other sessions, eviction takes care of them
                 delete_file(file_name)
                 if file_name in st.session_state.processed_file_info:
                     del st.session_state.processed_file_info[file_name]
-                if file_name in st.session_state.chat_history:
-                    del st.session_state.chat_history[file_name]
+                st.session_state.chat_store.drop(file_name)
+                st.session_state.earlier_shown.pop(file_name, None)
                 st.toast("file not ingested")    
 
 files_to_remove=[]
@@ -133,18 +234,14 @@ for file_name in st.session_state.processed_file_info.keys():
 
 if files_to_remove:
     for file_name in files_to_remove:
-        key_value=st.session_state.processed_file_info[file_name]
-        tmp_path=key_value["tmp_path"]
-        pdf_viewer_path = key_value.get("pdf_viewer_path")
-
-        if tmp_path and os.path.exists(tmp_path):
-            os.remove(tmp_path)
-        if pdf_viewer_path and os.path.exists(pdf_viewer_path) and pdf_viewer_path != tmp_path:
-            os.remove(pdf_viewer_path)
         delete_file(file_name)
         del st.session_state.processed_file_info[file_name]
-        if file_name in st.session_state.chat_history:
-            del st.session_state.chat_history[file_name]
+        for chat_key in st.session_state.chat_store.keys():
+            if chat_key == file_name or (isinstance(chat_key, tuple) and file_name in chat_key):
+                st.session_state.chat_store.drop(chat_key)
+                st.session_state.earlier_shown.pop(chat_key, None)
+        st.session_state.viewer_page.pop(file_name, None)
+        st.session_state.cited_pages.pop(file_name, None)
 
         if st.session_state.selected_file_name==file_name:
             st.session_state.selected_file_name=None
@@ -183,13 +280,15 @@ else:
         chat_key=selected_file_name
 
         if selected_file_info is not None and selected_file_info["ingested"]==True:
+            if selected_file_info["pdf_viewer_path"] and file_cache.get(selected_file_info["digest"], ".pdf") is None:
+                # evicted from the shared cache, write it back from the upload
+                uploaded_file = next(f for f in uploaded_files if f.name == selected_file_name)
+                _, selected_file_info["tmp_path"], selected_file_info["pdf_viewer_path"] = materialize_file(uploaded_file)
             session_viewer_path=selected_file_info["pdf_viewer_path"]
     
             session_file_name=st.session_state.selected_file_name
 
-            if chat_key not in st.session_state.chat_history:
-                    st.session_state.chat_history[chat_key] = []
-            session_chat_history = st.session_state.chat_history[chat_key]
+            st.session_state.chat_store.ensure(chat_key)
 
             col1, col2 = st.columns([1, 1.5])
 
@@ -197,14 +296,17 @@ else:
                 st.subheader(f"Viewing: {st.session_state.selected_file_name}")
                 use_container_width=True
                 
-                pdf_viewer(
-                        session_viewer_path,
-                        width="100%",
-                        height=1000,
-                        zoom_level="auto",
-                        viewer_align="right",
-                        show_page_separator=True,
-                        )
+                if viewer_mode == "window" and selected_file_info.get("page_count"):
+                    show_page_window(session_file_name, selected_file_info)
+                else:
+                    pdf_viewer(
+                            session_viewer_path,
+                            width="100%",
+                            height=1000,
+                            zoom_level="auto",
+                            viewer_align="right",
+                            show_page_separator=True,
+                            )
 
             with col2:
                 st.subheader("Chat with your file")
@@ -219,15 +321,12 @@ else:
            """
                 ):
 
-                    for message in session_chat_history:
-                         avatar="https://img.icons8.com/?size=100&id=0LnHUOCnYTrK&format=png&color=F25081" if message["role"] == "user" else "https://img.icons8.com/?size=100&id=100414&format=png&color=7950F2"
-                         with st.chat_message(message["role"], avatar=avatar):
-                              st.write(message["content"])
+                    show_chat(chat_key)
                     
 
                 if user_input := st.chat_input("Ask a question about the document:"):
                 
-                    st.session_state.chat_history[chat_key].append({"role": "user", "content": user_input})
+                    st.session_state.chat_store.append(chat_key, {"role": "user", "content": user_input})
 
                     with st.spinner("Thinking..."):
                         initial_state = GraphState(
@@ -242,17 +341,21 @@ else:
                     )
                         final_state = rag_graph_app.invoke(initial_state)
                         final_answer = final_state.get("answer")
+
+                    answer_pages = cited_pages(final_state.get("documents", []))
+                    st.session_state.cited_pages[chat_key] = answer_pages
+                    if answer_pages:
+                        # page of the best ranked chunk
+                        go_to_page(chat_key, answer_pages[0])
                     
-                    st.session_state.chat_history[chat_key].append({"role": "assistant", "content": final_answer})
+                    st.session_state.chat_store.append(chat_key, {"role": "assistant", "content": final_answer})
                     st.rerun()
 
 
 
     if len(selected_file_names) > 1 and st.session_state.selected_file_name is None:
          chat_key = tuple(sorted(selected_file_names))
-         if chat_key not in st.session_state.chat_history:
-                st.session_state.chat_history[chat_key] = []
-         session_chat_history = st.session_state.chat_history[chat_key]
+         st.session_state.chat_store.ensure(chat_key)
 
          st.subheader(f"Chat with: {', '.join(selected_file_names)}")
          with stylable_container(
@@ -265,14 +368,11 @@ else:
                     }
            """
          ):
-                     for message in session_chat_history:
-                         avatar="https://img.icons8.com/?size=100&id=0LnHUOCnYTrK&format=png&color=F25081" if message["role"] == "user" else "https://img.icons8.com/?size=100&id=100414&format=png&color=7950F2"
-                         with st.chat_message(message["role"], avatar=avatar):
-                             st.write(message["content"])
+                     show_chat(chat_key)
 
          if user_input := st.chat_input("Ask a question about the files:"):
 
-            st.session_state.chat_history[chat_key].append({"role": "user", "content": user_input})
+            st.session_state.chat_store.append(chat_key, {"role": "user", "content": user_input})
 
             with st.spinner("Thinking..."):
                             
@@ -294,7 +394,7 @@ else:
                 final_answer = final_state.get("answer")
 
                         
-            st.session_state.chat_history[chat_key].append({"role": "assistant", "content": final_answer})
+            st.session_state.chat_store.append(chat_key, {"role": "assistant", "content": final_answer})
             st.rerun() 
 
 placeholder = st.empty()
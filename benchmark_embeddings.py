@@ -0,0 +1,87 @@
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+load_dotenv()
+
+from data_processing import load_file, split_docs
+from db_utils import embedding_model
+from embedding_backend import BACKENDS, build_embeddings
+
+# ingestion throughput (chunks/sec) per embedding backend, vectors are checked against the plain torch model.
+# chunks the same way ingestion does (split_docs defaults) unless --chunk-size/--chunk-overlap are given.
+# usage: python benchmark_embeddings.py --file deck.pdf --backends torch onnx onnx-int8 --output results.json
+# exits non-zero if a backend misses --tolerance or --min-speedup, so the result can gate a backend switch.
+
+
+def encode(embeddings, texts, repeats):
+    # first call warms up (onnx session init, torch lazy kernels)
+    embeddings.embed_documents(texts[:8])
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        vectors = embeddings.embed_documents(texts)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return np.asarray(vectors, dtype=np.float32), best
+
+
+def cosine_rows(a, b):
+    norms = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+    norms[norms == 0] = 1e-12
+    return np.sum(a * b, axis=1) / norms
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding backend throughput and accuracy benchmark")
+    parser.add_argument("--file", required=True, help="pdf/pptx to chunk and embed")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--chunk-size", type=int, default=None, help="defaults to the ingestion setting")
+    parser.add_argument("--chunk-overlap", type=int, default=None, help="defaults to the ingestion setting")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.02, help="max allowed 1 - cosine vs torch")
+    parser.add_argument("--min-speedup", type=float, default=None, help="required speedup over torch for non-torch backends")
+    parser.add_argument("--output", default=None, help="write the results as json")
+    args = parser.parse_args()
+
+    split_kwargs = {}
+    if args.chunk_size is not None:
+        split_kwargs["chunk_size"] = args.chunk_size
+    if args.chunk_overlap is not None:
+        split_kwargs["chunk_overlap"] = args.chunk_overlap
+    texts = [chunk.page_content for chunk in split_docs(load_file(args.file), **split_kwargs)]
+    if not texts:
+        sys.exit(f"[ERROR] No text chunks extracted from {args.file}")
+    print(f"{len(texts)} chunks from {args.file}, model {embedding_model}")
+
+    baseline, baseline_time = encode(build_embeddings(embedding_model, "torch"), texts, args.repeats)
+    print(f"{'backend':<12}{'chunks/s':>10}{'speedup':>10}{'min cos':>10}{'mean cos':>10}  ok")
+    results = []
+    for backend in args.backends:
+        if backend == "torch":
+            vectors, elapsed = baseline, baseline_time
+        else:
+            vectors, elapsed = encode(build_embeddings(embedding_model, backend), texts, args.repeats)
+        cos = cosine_rows(baseline, vectors)
+        speedup = baseline_time / elapsed
+        ok = 1 - cos.min() <= args.tolerance
+        if args.min_speedup is not None and backend != "torch":
+            ok = ok and speedup >= args.min_speedup
+        results.append({
+            "backend": backend,
+            "chunks_per_sec": len(texts) / elapsed,
+            "speedup": speedup,
+            "min_cos": float(cos.min()),
+            "mean_cos": float(cos.mean()),
+            "ok": bool(ok),
+        })
+        print(f"{backend:<12}{len(texts) / elapsed:>10.1f}{speedup:>10.2f}{cos.min():>10.4f}{cos.mean():>10.4f}  {'yes' if ok else 'NO'}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"file": args.file, "model": embedding_model, "chunks": len(texts), "results": results}, f, indent=2)
+
+    sys.exit(0 if all(row["ok"] for row in results) else 1)
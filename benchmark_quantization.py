@@ -0,0 +1,83 @@
+import argparse
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+load_dotenv()
+
+from db_utils import check_env, embed_queries, vector_search, search_index
+from vector_quantization import recall_at_k, rescore_factor
+
+# recall vs latency of the configured vector index, exhaustive (exact) search is the ground truth.
+# usage: python benchmark_quantization.py --files a.pdf b.pdf --questions questions.txt [--index other_index]
+
+
+def run_config(vectors, file_names, k, index_name, exact=False, rescore_candidates=0):
+    latencies = []
+    ids = []
+    for vector in vectors:
+        start = time.perf_counter()
+        results = vector_search(vector, file_names, k=k, index_name=index_name, exact=exact, rescore_candidates=rescore_candidates)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids.append([res["_id"] for res in results])
+    return ids, latencies
+
+
+def compare_quantization(questions: list[str], file_names: list[str], k: int = 5, index_names: list[str] = None, rescore_candidates: int = None) -> list[dict]:
+    """
+    Compares ann search with and without full precision rescoring against exact search.
+
+    Args:
+        questions: Queries to run.
+        file_names: Files to search in.
+        k: Results per query.
+        index_names: Indexes to compare (e.g. one per quantization type), defaults to SEARCH_INDEX.
+        rescore_candidates: Candidate multiplier for the rescored run, defaults to RESCORE_FACTOR.
+
+    Returns:
+        One row per index/config with mean recall@k and p50/p95 latency in ms.
+    """
+    index_names = index_names or [search_index]
+    rescore_candidates = rescore_candidates or max(rescore_factor, 2)
+    vectors = embed_queries(questions)
+
+    # exhaustive search scores the same stored vectors regardless of index quantization
+    truth, exact_latencies = run_config(vectors, file_names, k, index_names[0], exact=True)
+    rows = [_row(index_names[0], "exact", truth, truth, exact_latencies)]
+
+    for index_name in index_names:
+        ids, latencies = run_config(vectors, file_names, k, index_name)
+        rows.append(_row(index_name, "ann", truth, ids, latencies))
+        ids, latencies = run_config(vectors, file_names, k, index_name, rescore_candidates=rescore_candidates)
+        rows.append(_row(index_name, f"ann+rescore x{rescore_candidates}", truth, ids, latencies))
+    return rows
+
+
+def _row(index_name, mode, truth, ids, latencies):
+    recalls = [recall_at_k(expected, got) for expected, got in zip(truth, ids)]
+    return {
+        "index": index_name,
+        "mode": mode,
+        "recall": float(np.mean(recalls)) if recalls else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50)) if latencies else 0.0,
+        "p95_ms": float(np.percentile(latencies, 95)) if latencies else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall/latency comparison for quantized vector search")
+    parser.add_argument("--files", nargs="+", required=True, help="file_name values to search in")
+    parser.add_argument("--questions", required=True, help="text file, one question per line")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--index", nargs="*", default=None, help="index names to compare, defaults to SEARCH_INDEX")
+    parser.add_argument("--rescore", type=int, default=None, help="candidate multiplier for the rescored run")
+    args = parser.parse_args()
+
+    check_env()
+    with open(args.questions) as f:
+        questions = [line.strip() for line in f if line.strip()]
+
+    rows = compare_quantization(questions, args.files, k=args.k, index_names=args.index, rescore_candidates=args.rescore)
+    print(f"{'index':<24}{'mode':<22}{'recall@' + str(args.k):>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for row in rows:
+        print(f"{row['index']:<24}{row['mode']:<22}{row['recall']:>10.3f}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}")
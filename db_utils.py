@@ -1,10 +1,12 @@
 import os
+import threading
 from dotenv import load_dotenv 
 from pymongo import MongoClient
-from langchain_mongodb import MongoDBAtlasVectorSearch
+from pymongo.operations import SearchIndexModel
 from langchain_core.documents import Document
-from langchain_huggingface import HuggingFaceEmbeddings
 import streamlit as st
+from embedding_backend import build_embeddings, BatchingEmbeddings, embedding_backend
+from vector_quantization import build_index_definition, encode_vector, rescore, rescore_factor, vector_quantization
 
 load_dotenv()
 
@@ -16,6 +18,11 @@ google_api_key=os.getenv("GOOGLE_API_KEY")
 embedding_model=os.getenv("EMBEDDING_MODEL")
 collection_name=os.getenv("COLLECTION_NAME") 
 
+# process-wide handles, shared by the streamlit app and the api workers
+_mongo_client = None
+_hf_embeddings = None
+_handles_lock = threading.Lock()
+
 def check_env():
     if not all(
         [
@@ -33,54 +40,173 @@ def check_env():
 
 
 def mongo_connection_url():
-    try:
-        client = MongoClient(mongo_url)
-        client.admin.command('ping')  
-        return client
-    except Exception as e:
-        st.error(f"Failed to connect to MongoDB: {e}")
-        raise ConnectionError(f"[ERROR] Failed to connect to MongoDB: {e}")
+    global _mongo_client
+    if _mongo_client is not None:
+        return _mongo_client
+    with _handles_lock:
+        if _mongo_client is not None:
+            return _mongo_client
+        try:
+            client = MongoClient(mongo_url)
+            client.admin.command('ping')  
+            _mongo_client = client
+            return client
+        except Exception as e:
+            st.error(f"Failed to connect to MongoDB: {e}")
+            raise ConnectionError(f"[ERROR] Failed to connect to MongoDB: {e}")
 
 def set_embedding_model():
+    global _hf_embeddings
+    if _hf_embeddings is not None:
+        return _hf_embeddings
     model_name = embedding_model
-    model_kwargs = {'device': 'cpu'}
-    encode_kwargs = {'normalize_embeddings': False}
-    try:
-        print("DEBUG: Attempting to initialize HuggingFaceEmbeddings...")
-        hf_embeddings = HuggingFaceEmbeddings(
-            model_name=model_name,
-            model_kwargs=model_kwargs,
-            encode_kwargs=encode_kwargs
-        )
-        print("HuggingFaceEmbeddings initialized successfully.")
-        return hf_embeddings
-    except Exception as e:
-        print(f"ERROR: Exception caught during HuggingFaceEmbeddings initialization: {e}")
+    with _handles_lock:
+        if _hf_embeddings is not None:
+            return _hf_embeddings
+        try:
+            print(f"DEBUG: Attempting to initialize HuggingFaceEmbeddings ({embedding_backend} backend)...")
+            hf_embeddings = build_embeddings(model_name)
+            print("HuggingFaceEmbeddings initialized successfully.")
+            _hf_embeddings = BatchingEmbeddings(hf_embeddings)
+            return _hf_embeddings
+        except Exception as e:
+            print(f"ERROR: Exception caught during HuggingFaceEmbeddings initialization: {e}")
         
     
 def get_collection():
     client = mongo_connection_url()
     db = client[db_name]
     return db[collection_name]
-    
 
-def add_documents(chunks:list[Document], file_name:str):  
+
+def embed_queries(queries: list[str]) -> list[list[float]]:
+    """
+    Embeds a batch of questions with a single encoder call.
+
+    Args:
+        queries: The questions to embed.
+
+    Returns:
+        One embedding per question, in the same order.
+    """
+    if not queries:
+        return []
+    embeddings = set_embedding_model()
+    return embeddings.embed_documents(queries)
+
+
+def vector_search(query_vector: list[float], file_names: list[str], k: int = 5, num_candidates: int = None, index_name: str = None, exact: bool = False, rescore_candidates: int = None) -> list[dict]:
+    """
+    Runs an Atlas $vectorSearch with an already computed query embedding.
+
+    Args:
+        query_vector: The query embedding.
+        file_names: Only chunks from these files are returned.
+        k: Number of chunks to return.
+        num_candidates: ANN candidate pool size, defaults to 20 * k.
+        index_name: Atlas search index, defaults to SEARCH_INDEX.
+        exact: Run an exhaustive (ENN) search instead of ANN, used as ground truth.
+        rescore_candidates: Fetch k * this many results and re-rank them on the full precision
+            vectors, defaults to RESCORE_FACTOR on a quantized index. 0 or 1 disables rescoring.
+
+    Returns:
+        The raw result documents with the similarity under "score".
+    """
+    if rescore_candidates is None:
+        # a full precision index already ranks exactly, rescoring would only pull vectors over the wire
+        rescore_candidates = rescore_factor if vector_quantization != "none" else 0
+    do_rescore = not exact and rescore_candidates > 1
+    limit = k * rescore_candidates if do_rescore else k
+
+    search_stage = {
+        "index": index_name or search_index,
+        "path": "vector_embedding",
+        "queryVector": list(query_vector),
+        "limit": limit,
+        "filter": {"file_name": {"$in": list(file_names)}},
+    }
+    if exact:
+        search_stage["exact"] = True
+    else:
+        search_stage["numCandidates"] = max(num_candidates or k * 20, limit)
+
+    pipeline = [
+        {"$vectorSearch": search_stage},
+        {"$set": {"score": {"$meta": "vectorSearchScore"}}},
+    ]
+    if not do_rescore:
+        pipeline.append({"$project": {"vector_embedding": 0}})
+
+    collection = get_collection()
+    results = list(collection.aggregate(pipeline))
+    if do_rescore:
+        results = rescore(query_vector, results, k)
+    return results
+
+
+def search_by_vector(query_vector: list[float], file_names: list[str], k: int = 5, num_candidates: int = None, index_name: str = None) -> list[Document]:
+    """
+    Same as vector_search but returns the chunks as Documents, similarity in metadata['score'].
+    """
+    docs = []
+    for res in vector_search(query_vector, file_names, k=k, num_candidates=num_candidates, index_name=index_name):
+        res.pop("_id", None)
+        text = res.pop("text", "")
+        docs.append(Document(page_content=text, metadata=res))
+    return docs
+
+
+def create_vector_index(quantization: str = None, num_dimensions: int = 384, index_name: str = None):
+    """
+    Creates (or replaces) the vector search index with the requested quantization.
+    Atlas rebuilds the index in the background, queries keep working on the old one until it is ready.
+    """
+    collection = get_collection()
+    index_name = index_name or search_index
+    definition = build_index_definition(quantization, num_dimensions)
+    existing = {idx["name"] for idx in collection.list_search_indexes()}
+    if index_name in existing:
+        collection.update_search_index(index_name, definition)
+    else:
+        collection.create_search_index(SearchIndexModel(definition=definition, name=index_name, type="vectorSearch"))
+    print(f"Vector index {index_name} set to quantization={definition['fields'][0]['quantization']}")
+    return definition
+
+
+def prepare_documents(chunks: list[Document], file_name: str) -> list[dict]:
+    """
+    Embeds chunks and lays them out the way langchain_mongodb does (text, vector_embedding,
+    metadata fields at the top level) so the file_name filter of the vector index matches.
+    Vectors are written in the VECTOR_STORAGE format.
+    """
     embedding_model = set_embedding_model()
     st.toast("embedding model set")
-    collection=get_collection()
-    st.toast("collection set")
     for chunk in chunks:
         chunk.metadata['file_name'] = file_name
     st.toast("metadata updated")
-    vector_store = MongoDBAtlasVectorSearch(
-    embedding=embedding_model,
-    collection= collection,
-    index_name=search_index,
-    relevance_score_fn="cosine",
-    embedding_key="vector_embedding")
-
-    docs = [Document(page_content=chunk.page_content,metadata=chunk.metadata) for chunk in chunks] 
-    vector_store.add_documents(docs)
+
+    vectors = embedding_model.embed_documents([chunk.page_content for chunk in chunks])
+    return [
+        {**chunk.metadata, "text": chunk.page_content, "vector_embedding": encode_vector(vector)}
+        for chunk, vector in zip(chunks, vectors)
+    ]
+
+
+def add_documents(chunks:list[Document], file_name:str):  
+    records = prepare_documents(chunks, file_name)
+    collection=get_collection()
+    st.toast("collection set")
+    if records:
+        collection.insert_many(records)
+
+def replace_documents(records: list[dict], file_name: str):
+    """
+    Swaps a file's chunks for already prepared records. The new chunks are inserted before
+    the old ones are deleted, so a failure never leaves the file without chunks.
+    """
+    collection = get_collection()
+    new_ids = collection.insert_many(records).inserted_ids if records else []
+    collection.delete_many({"file_name": file_name, "_id": {"$nin": new_ids}})
 
 def delete_file(file_name: str):
     collection = get_collection()
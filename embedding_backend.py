@@ -0,0 +1,154 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from langchain_core.embeddings import Embeddings
+from langchain_huggingface import HuggingFaceEmbeddings
+
+# cpu inference backend for EMBEDDING_MODEL: "torch" | "torch-int8" | "onnx" | "onnx-int8"
+embedding_backend = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+# 0 leaves the runtime default (all cores)
+embedding_threads = int(os.getenv("EMBEDDING_THREADS", "0"))
+embedding_batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+# query encodes arriving within this window (from any session) share one forward pass
+embedding_batch_wait_ms = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+embedding_max_batch = int(os.getenv("EMBEDDING_MAX_BATCH", "64"))
+# onnx int8 export target: "arm64" | "avx2" | "avx512" | "avx512_vnni"
+onnx_quantization_config = os.getenv("EMBEDDING_ONNX_QCONFIG", "avx2")
+embedding_export_dir = os.getenv("EMBEDDING_EXPORT_DIR", os.path.join(os.path.expanduser("~"), ".cache", "dynabot_embeddings"))
+
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+
+def _onnx_session_options():
+    import onnxruntime
+    options = onnxruntime.SessionOptions()
+    if embedding_threads > 0:
+        options.intra_op_num_threads = embedding_threads
+        options.inter_op_num_threads = 1
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return options
+
+
+def export_int8_onnx(model_name: str) -> tuple[str, str]:
+    """
+    Exports model_name to ONNX and dynamically quantizes it to int8, once per model.
+
+    Args:
+        model_name: Hugging Face id of the sentence-transformers model.
+
+    Returns:
+        (local model dir, onnx file name inside it) to load it back with the onnx backend.
+    """
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.backend import export_dynamic_quantized_onnx_model
+
+    export_dir = os.path.join(embedding_export_dir, model_name.replace("/", "__"))
+    # sentence-transformers names the file model_<weights dtype>_<config>.onnx, and optimum's
+    # avx2 preset quantizes weights to uint8 while the others use int8
+    weights_dtype = "quint8" if onnx_quantization_config == "avx2" else "qint8"
+    file_name = f"onnx/model_{weights_dtype}_{onnx_quantization_config}.onnx"
+    if not os.path.exists(os.path.join(export_dir, file_name)):
+        print(f"DEBUG: Exporting {model_name} to int8 ONNX in {export_dir}...")
+        model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+        model.save_pretrained(export_dir)
+        export_dynamic_quantized_onnx_model(model, onnx_quantization_config, export_dir)
+        if not os.path.exists(os.path.join(export_dir, file_name)):
+            raise RuntimeError(f"[ERROR] int8 ONNX export did not produce {file_name} in {export_dir}")
+    return export_dir, file_name
+
+
+def build_embeddings(model_name: str, backend: str = None) -> HuggingFaceEmbeddings:
+    """
+    HuggingFaceEmbeddings for model_name running on the requested cpu backend.
+
+    Args:
+        model_name: Hugging Face id of the sentence-transformers model.
+        backend: One of BACKENDS, defaults to EMBEDDING_BACKEND.
+
+    Returns:
+        The embeddings, same vectors (within quantization error) as the plain torch model.
+    """
+    backend = (backend or embedding_backend).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"[ERROR] Unsupported embedding backend: {backend}")
+
+    model_kwargs = {'device': 'cpu'}
+    encode_kwargs = {'normalize_embeddings': False, 'batch_size': embedding_batch_size}
+
+    if backend.startswith("onnx"):
+        model_kwargs['backend'] = "onnx"
+        model_kwargs['model_kwargs'] = {
+            'provider': "CPUExecutionProvider",
+            'session_options': _onnx_session_options(),
+        }
+        if backend == "onnx-int8":
+            model_name, file_name = export_int8_onnx(model_name)
+            model_kwargs['model_kwargs']['file_name'] = file_name
+    elif embedding_threads > 0:
+        import torch
+        torch.set_num_threads(embedding_threads)
+
+    hf_embeddings = HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs=model_kwargs,
+        encode_kwargs=encode_kwargs
+    )
+
+    if backend == "torch-int8":
+        import torch
+        # HuggingFaceEmbeddings has no public handle on its SentenceTransformer, fail loudly if that changes
+        client = getattr(hf_embeddings, "_client", None)
+        if not isinstance(client, torch.nn.Module):
+            raise RuntimeError("[ERROR] torch-int8 backend: HuggingFaceEmbeddings no longer exposes its SentenceTransformer as _client")
+        torch.quantization.quantize_dynamic(client, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+    return hf_embeddings
+
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings and coalesces concurrent embed_query calls (one per streamlit
+    session / api request thread) into a single embed_documents forward pass.
+    embed_documents goes straight through, ingestion is already batched.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_batch: int = None, max_wait_ms: float = None):
+        self.embeddings = embeddings
+        self.max_batch = max_batch or embedding_max_batch
+        self.max_wait = (embedding_batch_wait_ms if max_wait_ms is None else max_wait_ms) / 1000
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                vectors = self.embeddings.embed_documents([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
@@ -4,13 +4,13 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from langgraph.graph import StateGraph, END
-from langchain_community.vectorstores import MongoDBAtlasVectorSearch
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.documents import Document
 
-from db_utils import get_collection, set_embedding_model
+from db_utils import set_embedding_model, search_by_vector
+from reranker import rerank, reranker_enabled, rerank_candidates
 import streamlit as st
 
 class GraphState(TypedDict):
@@ -24,25 +24,7 @@ class GraphState(TypedDict):
     search_kwargs: dict
     search_index_name: str
     initial_answer: str
-
-def get_retriever(search_index_name: str, file_names_filter: List[str],k:int=5):
-    embeddings = set_embedding_model()
-    collection = get_collection()
-
-    vector_store=MongoDBAtlasVectorSearch(
-        collection=collection,
-        embedding=embeddings,
-        index_name=search_index_name,
-        relevance_score_fn="cosine",
-        embedding_key="vector_embedding"
-    )
-
-    retriever = vector_store.as_retriever(
-        search_type="similarity",      
-        search_kwargs={"k": k}          
-    )
-
-    return retriever
+    query_embedding: List[float]
 
 def retrieve_documents(state: GraphState) -> GraphState:
     query = state.get("query", "")
@@ -50,18 +32,41 @@ def retrieve_documents(state: GraphState) -> GraphState:
     search_index_name = state.get("search_index_name", "")
 
     k_value = state.get("search_kwargs", {}).get("k", 5)
+    query_embedding = state.get("query_embedding")
+    # over-fetch cheaply from the index, rerank_documents narrows it back down to k
+    fetch_k = k_value * rerank_candidates if reranker_enabled() else k_value
 
     try:
-        retriever = get_retriever(search_index_name, selected_file_names, k=k_value)
-        mongo_filter = {"metadata.file_name": {"$in": selected_file_names}}
-        documents = retriever.invoke(query, config={"search_kwargs": {"pre_filter": mongo_filter}})
-       
+        if not query_embedding:
+            # embed here instead of going through the langchain retriever so the search
+            # can rescore quantized candidates against the full precision vectors
+            query_embedding = set_embedding_model().embed_query(query)
+            state["query_embedding"] = query_embedding
+        documents = search_by_vector(query_embedding, selected_file_names, k=fetch_k, index_name=search_index_name or None)
+
         state["documents"] = documents
     except Exception as e:
         print(f"Error during document retrieval: {e}")
         state["documents"] = []
     st.toast("Retrieved documents for query")
     return state
+
+def rerank_documents(state: GraphState) -> GraphState:
+    query = state.get("query", "")
+    documents = state.get("documents", [])
+    k_value = state.get("search_kwargs", {}).get("k", 5)
+
+    if not reranker_enabled():
+        return state
+
+    try:
+        state["documents"] = rerank(query, documents, top_n=k_value)
+    except Exception as e:
+        # fall back to the vector search order
+        print(f"Error during reranking: {e}")
+        state["documents"] = documents[:k_value]
+    st.toast("Reranked retrieved documents")
+    return state
     
 def generate_answer(state: GraphState) -> GraphState:
     query = state.get("query", "")
@@ -178,9 +183,11 @@ def generate_better_prompt(state: GraphState) -> GraphState:
     
     rephraser = (reprompt_template | llm | StrOutputParser())
     
+    new_query = query
     try:
-        new_query = rephraser.invoke({"query": query}).strip()
+        new_query = rephraser.invoke({"original_query": query, "retrieved_content": retrieved_content}).strip()
         state["query"] = new_query
+        state["query_embedding"] = None
     except Exception as e:
         print(f"Error during prompt generation: {e}")
     st.toast("Generated better prompt for query")    
@@ -212,6 +219,7 @@ def build_rag_graph():
     
 
     workflow.add_node("retrieve", retrieve_documents)
+    workflow.add_node("rerank", rerank_documents)
     workflow.add_node("generate", generate_answer)
     workflow.add_node("evaluate", evaluate_answer)
     workflow.add_node("retry_counter", retry_counter)
@@ -222,7 +230,8 @@ def build_rag_graph():
     
    
     workflow.set_entry_point("retrieve")
-    workflow.add_edge("retrieve", "generate")
+    workflow.add_edge("retrieve", "rerank")
+    workflow.add_edge("rerank", "generate")
     workflow.add_edge("generate", "evaluate")
     
   
@@ -0,0 +1,84 @@
+import os
+
+import fitz
+from langchain_core.documents import Document
+
+# the viewer only ever gets a small slice of the pdf instead of the whole file on every rerun
+viewer_mode = os.getenv("VIEWER_MODE", "window").lower()  # "window" | "full"
+viewer_window = int(os.getenv("VIEWER_WINDOW", "5"))
+
+
+def page_count(file_path: str) -> int:
+    with fitz.open(file_path) as doc:
+        return doc.page_count
+
+
+def window_start(page: int, total_pages: int, window: int = None) -> int:
+    """
+    First page (1-based) of the window that shows `page`, windows are aligned to multiples
+    of the window size so nearby pages hit the same cached slice.
+    """
+    window = window or viewer_window
+    page = max(1, min(page, total_pages))
+    return ((page - 1) // window) * window + 1
+
+
+def render_page_window(file_path: str, start_page: int, total_pages: int, file_hash: str, file_cache, window: int = None) -> str:
+    """
+    Extracts pages [start_page, start_page + window) into a small compressed pdf.
+    Slices live in the shared FileCache next to the uploads, so they fall under its eviction.
+
+    Args:
+        file_path: The full pdf.
+        start_page: First page of the window, 1-based.
+        total_pages: Page count of the pdf, known from ingestion.
+        file_hash: Content hash of the uploaded file, used as the cache key.
+        file_cache: The session_store.FileCache to keep slices in.
+        window: Number of pages, defaults to VIEWER_WINDOW.
+
+    Returns:
+        Path to the cached slice.
+    """
+    window = window or viewer_window
+    first = max(0, min(start_page - 1, total_pages - 1))
+    last = min(first + window, total_pages) - 1
+    suffix = f".p{first + 1}-{last + 1}.pdf"
+
+    # cache hit never opens the (possibly huge) source pdf
+    slice_path = file_cache.get(file_hash, suffix)
+    if slice_path is not None:
+        return slice_path
+
+    slice_path = file_cache.path_for(file_hash, suffix)
+    with fitz.open(file_path) as src:
+        out = fitz.open()
+        out.insert_pdf(src, from_page=first, to_page=last)
+        # write under a temp name first so a concurrent session never reads a half written slice
+        tmp_path = f"{slice_path}.{os.getpid()}.tmp"
+        out.save(tmp_path, garbage=4, deflate=True, deflate_images=True, deflate_fonts=True)
+        out.close()
+    os.replace(tmp_path, slice_path)
+    file_cache.evict(keep={slice_path, file_path})
+    return slice_path
+
+
+def cited_pages(documents: list[Document]) -> list[int]:
+    """
+    1-based page numbers referenced by retrieved chunks, in the order of the chunks
+    (best first after reranking), without duplicates.
+    PyMuPDFLoader pages are 0-based, the pdfplumber table chunks are already 1-based.
+    """
+    pages = []
+    for doc in documents:
+        page = doc.metadata.get("page")
+        if page is None:
+            continue
+        try:
+            page = int(page)
+        except (TypeError, ValueError):
+            continue
+        if doc.metadata.get("type") != "table":
+            page += 1
+        if page not in pages:
+            pages.append(page)
+    return pages
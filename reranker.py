@@ -0,0 +1,99 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+load_dotenv()
+
+# second retrieval stage: the vector search returns k * rerank_candidates chunks and a
+# small cpu cross-encoder keeps the best k of them. "none" disables reranking.
+reranker_model = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+rerank_candidates = int(os.getenv("RERANK_CANDIDATES", "4"))
+rerank_batch_size = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+rerank_cache_size = int(os.getenv("RERANK_CACHE_SIZE", "10000"))
+
+_cross_encoder = None
+_model_lock = threading.Lock()
+
+_score_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def reranker_enabled() -> bool:
+    return bool(reranker_model) and reranker_model.lower() != "none" and rerank_candidates > 1
+
+
+def get_cross_encoder():
+    global _cross_encoder
+    if _cross_encoder is not None:
+        return _cross_encoder
+    with _model_lock:
+        if _cross_encoder is None:
+            from sentence_transformers import CrossEncoder
+            _cross_encoder = CrossEncoder(reranker_model, device="cpu")
+            print(f"CrossEncoder {reranker_model} initialized successfully.")
+    return _cross_encoder
+
+
+def _cache_key(query: str, text: str) -> str:
+    query_hash = hashlib.sha1(query.encode("utf-8")).hexdigest()
+    chunk_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    return f"{query_hash}:{chunk_hash}"
+
+
+def score_pairs(query: str, texts: list[str]) -> list[float]:
+    """
+    Cross-encoder relevance of each text for the query. Pairs seen before come from
+    the LRU cache, only the missing ones go through the model, in one batched call.
+    """
+    keys = [_cache_key(query, text) for text in texts]
+    scores = {}
+    missing = []
+    with _cache_lock:
+        for key, text in zip(keys, texts):
+            if key in _score_cache:
+                _score_cache.move_to_end(key)
+                scores[key] = _score_cache[key]
+            elif key not in scores:
+                scores[key] = None
+                missing.append((key, text))
+
+    if missing:
+        model = get_cross_encoder()
+        predicted = model.predict([(query, text) for _, text in missing], batch_size=rerank_batch_size, show_progress_bar=False)
+        with _cache_lock:
+            for (key, _), score in zip(missing, predicted):
+                scores[key] = float(score)
+                _score_cache[key] = float(score)
+            while len(_score_cache) > rerank_cache_size:
+                _score_cache.popitem(last=False)
+
+    return [scores[key] for key in keys]
+
+
+def rerank(query: str, documents: list[Document], top_n: int) -> list[Document]:
+    """
+    Reorders retrieved chunks by cross-encoder score and keeps the best top_n.
+
+    Args:
+        query: The user question.
+        documents: Candidates from the vector search.
+        top_n: Number of chunks to pass on to generation.
+
+    Returns:
+        The top_n documents, best first, with the score in metadata['rerank_score'].
+    """
+    if not documents:
+        return []
+
+    scores = score_pairs(query, [doc.page_content for doc in documents])
+    ranked = sorted(zip(scores, range(len(documents))), key=lambda pair: pair[0], reverse=True)
+    reranked = []
+    for score, i in ranked[:top_n]:
+        doc = documents[i]
+        doc.metadata["rerank_score"] = score
+        reranked.append(doc)
+    return reranked
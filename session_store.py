@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from collections import deque
+
+# per-session memory is bounded: only the last `chat_window` messages of each chat stay in
+# session_state, older ones are appended to a jsonl file and read back only when asked for.
+chat_window = int(os.getenv("SESSION_CHAT_WINDOW", "20"))
+session_store_dir = os.getenv("SESSION_STORE_DIR", os.path.join(tempfile.gettempdir(), "dynabot_sessions"))
+session_max_age = int(os.getenv("SESSION_MAX_AGE_HOURS", "24")) * 3600
+session_prune_interval = int(os.getenv("SESSION_PRUNE_INTERVAL_MINUTES", "60")) * 60
+
+_last_prune = 0.0
+_prune_lock = threading.Lock()
+
+# uploaded and converted files live in one content-addressed cache shared by all sessions
+file_cache_dir = os.getenv("FILE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "dynabot_files"))
+file_cache_max_bytes = int(os.getenv("FILE_CACHE_MAX_MB", "2048")) * 1024 * 1024
+
+
+def _chat_file_name(chat_key) -> str:
+    # chat keys are a file name or a sorted tuple of file names
+    return hashlib.sha1(repr(chat_key).encode("utf-8")).hexdigest() + ".jsonl"
+
+
+class ChatStore:
+    """
+    Chat history for one streamlit session, keyed like the old chat_history dict.
+    Keeps a fixed window of recent messages per chat in memory and spills the rest to disk.
+    """
+
+    def __init__(self, session_id: str, window: int = None, store_dir: str = None):
+        self.window = window or chat_window
+        self.session_dir = os.path.join(store_dir or session_store_dir, session_id)
+        self._recent = {}
+        self._spilled = {}
+
+    def keys(self) -> list:
+        return list(self._recent.keys())
+
+    def _path(self, chat_key) -> str:
+        return os.path.join(self.session_dir, _chat_file_name(chat_key))
+
+    def ensure(self, chat_key):
+        if chat_key not in self._recent:
+            self._recent[chat_key] = deque()
+            self._spilled[chat_key] = 0
+
+    def append(self, chat_key, message: dict):
+        self.ensure(chat_key)
+        recent = self._recent[chat_key]
+        recent.append(message)
+        if len(recent) > self.window:
+            os.makedirs(self.session_dir, exist_ok=True)
+            with open(self._path(chat_key), "a", encoding="utf-8") as f:
+                while len(recent) > self.window:
+                    f.write(json.dumps(recent.popleft()) + "\n")
+                    self._spilled[chat_key] += 1
+
+    def recent(self, chat_key) -> list[dict]:
+        return list(self._recent.get(chat_key, ()))
+
+    def has_earlier(self, chat_key) -> bool:
+        return self.earlier_count(chat_key) > 0
+
+    def earlier_count(self, chat_key) -> int:
+        count = self._spilled.get(chat_key, 0)
+        if count and not os.path.exists(self._path(chat_key)):
+            # pruned while this session sat idle, those messages are gone
+            self._spilled[chat_key] = 0
+            return 0
+        return count
+
+    def earlier(self, chat_key, count: int) -> list[dict]:
+        """
+        The last `count` messages that were spilled to disk, oldest first.
+        Reads the file backwards, so cost depends on count, not on the length of the history.
+        """
+        if count <= 0 or not self.has_earlier(chat_key):
+            return []
+        return [json.loads(line) for line in _tail_lines(self._path(chat_key), count)]
+
+    def drop(self, chat_key):
+        self._recent.pop(chat_key, None)
+        self._spilled.pop(chat_key, None)
+        path = self._path(chat_key)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _tail_lines(path: str, count: int, block_size: int = 64 * 1024) -> list[str]:
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b""
+        # one extra line so a block boundary never cuts the first wanted line
+        while position > 0 and data.count(b"\n") <= count:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            data = f.read(read_size) + data
+    lines = [line for line in data.decode("utf-8").splitlines() if line.strip()]
+    return lines[-count:]
+
+
+def prune_sessions(store_dir: str = None, max_age: int = None, force: bool = False):
+    """
+    Removes spilled chat files of sessions that have not written anything for max_age seconds.
+    Called whenever a session starts, but only does the directory scan once per
+    SESSION_PRUNE_INTERVAL_MINUTES unless forced.
+    """
+    global _last_prune
+    store_dir = store_dir or session_store_dir
+    max_age = max_age or session_max_age
+    with _prune_lock:
+        if not force and time.time() - _last_prune < session_prune_interval:
+            return
+        _last_prune = time.time()
+    if not os.path.isdir(store_dir):
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(store_dir):
+        path = os.path.join(store_dir, name)
+        try:
+            if not os.path.isdir(path):
+                continue
+            # appends don't touch the directory mtime, look at the files too
+            last_write = max([os.path.getmtime(path)] + [os.path.getmtime(os.path.join(path, f)) for f in os.listdir(path)])
+            if last_write < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            continue
+
+
+class FileCache:
+    """
+    Content-addressed file cache shared by every session of the process.
+    Files are stored as <sha256><ext>, identical uploads share one copy and the least
+    recently used files are evicted once the cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = None):
+        self.cache_dir = cache_dir or file_cache_dir
+        self.max_bytes = max_bytes or file_cache_max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def path_for(self, digest: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, f"{digest}{suffix}")
+
+    def get(self, digest: str, suffix: str):
+        """Path of a cached file (marked as recently used), or None if missing or evicted."""
+        path = self.path_for(digest, suffix)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put_bytes(self, data: bytes, suffix: str) -> tuple[str, str]:
+        """
+        Stores data under its content hash.
+
+        Args:
+            data: File content.
+            suffix: File extension including the dot, e.g. ".pdf".
+
+        Returns:
+            (digest, path) of the cached file.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.get(digest, suffix)
+        if path is None:
+            path = self.path_for(digest, suffix)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self.evict(keep={path})
+        return digest, path
+
+    def evict(self, keep: set = None):
+        keep = keep or set()
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path in keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    continue
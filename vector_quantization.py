@@ -0,0 +1,104 @@
+import os
+import numpy as np
+from bson.binary import Binary, BinaryVectorDtype
+
+# index side: "none" | "scalar" (int8) | "binary" (1 bit per dim), applied by Atlas at index build time
+vector_quantization = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+# document side: "array" (bson doubles, what langchain writes) | "binary" (packed float32 BinData)
+vector_storage = os.getenv("VECTOR_STORAGE", "array").lower()
+# on a quantized index, fetch k * factor ann candidates and re-rank them with the full precision vectors, 0 disables
+rescore_factor = int(os.getenv("RESCORE_FACTOR", "4"))
+
+QUANTIZATION_TYPES = ("none", "scalar", "binary")
+STORAGE_TYPES = ("array", "binary")
+
+
+def build_index_definition(quantization: str = None, num_dimensions: int = 384, embedding_key: str = "vector_embedding") -> dict:
+    """
+    Builds the Atlas vector search index definition (same shape as vector_index_schema.json).
+
+    Args:
+        quantization: "none", "scalar" or "binary", defaults to VECTOR_QUANTIZATION.
+        num_dimensions: Embedding size of the configured model.
+        embedding_key: Document field holding the vectors.
+
+    Returns:
+        The index definition dict.
+    """
+    quantization = (quantization or vector_quantization).lower()
+    if quantization not in QUANTIZATION_TYPES:
+        raise ValueError(f"[ERROR] Unsupported quantization: {quantization}")
+
+    return {
+        "fields": [
+            {
+                "numDimensions": num_dimensions,
+                "path": embedding_key,
+                "quantization": quantization,
+                "similarity": "cosine",
+                "type": "vector"
+            },
+            {
+                "path": "file_name",
+                "type": "filter"
+            }
+        ]
+    }
+
+
+def encode_vector(vector: list[float]):
+    """
+    Converts an embedding into the configured storage format.
+    float32 BinData is ~3x smaller than an array of bson doubles and Atlas indexes it directly.
+    """
+    if vector_storage == "binary":
+        return Binary.from_vector([float(x) for x in vector], BinaryVectorDtype.FLOAT32)
+    return [float(x) for x in vector]
+
+
+def decode_vector(value) -> np.ndarray:
+    """Reads a stored embedding back, whichever format it was written in."""
+    if isinstance(value, Binary):
+        return np.asarray(value.as_vector().data, dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+def cosine_scores(query_vector, vectors) -> np.ndarray:
+    query = np.asarray(query_vector, dtype=np.float32)
+    matrix = np.vstack([decode_vector(v) for v in vectors])
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    norms[norms == 0] = 1e-12
+    return matrix @ query / norms
+
+
+def rescore(query_vector, results: list[dict], k: int, embedding_key: str = "vector_embedding") -> list[dict]:
+    """
+    Re-ranks ann candidates by exact cosine similarity against their full precision vectors.
+
+    Args:
+        query_vector: The query embedding.
+        results: Raw $vectorSearch documents, still carrying their embeddings.
+        k: Number of results to keep.
+
+    Returns:
+        The top k results, embedding removed and "score" replaced by the exact similarity.
+    """
+    if not results:
+        return []
+
+    scores = cosine_scores(query_vector, [res[embedding_key] for res in results])
+    order = np.argsort(-scores)[:k]
+    rescored = []
+    for i in order:
+        res = results[i]
+        res.pop(embedding_key, None)
+        # same [0, 1] scale as atlas' vectorSearchScore for cosine
+        res["score"] = float((1 + scores[i]) / 2)
+        rescored.append(res)
+    return rescored
+
+
+def recall_at_k(expected_ids: list, retrieved_ids: list) -> float:
+    if not expected_ids:
+        return 1.0
+    return len(set(expected_ids) & set(retrieved_ids)) / len(expected_ids)